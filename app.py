@@ -4,9 +4,15 @@
 # =======================================================================
 
 from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy import create_engine, Column, Integer, Float, Boolean, String, DateTime, func
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import create_engine, Column, Integer, Float, Boolean, String, DateTime, func, select, event, Index
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import asyncio
+import threading
+import time
+from collections import deque
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 from pydantic import BaseModel, Field 
@@ -22,6 +28,26 @@ engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
 
+# WAL mode with relaxed synchronous makes the batched sensor commits cheap:
+# one fsync per batch instead of one per inserted row. Memory temp store and
+# mmap keep sorting/aggregation off the disk for the statistics queries.
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+# Refresh query-planner statistics when a connection is returned, as
+# recommended by the SQLite docs for long-running applications.
+@event.listens_for(engine, "close")
+def _optimize_on_close(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA optimize")
+    cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -50,6 +76,10 @@ class DBSensorData(Base):
     irrigation_status = Column(Boolean)
     ai_decision = Column(String)
 
+# Composite descending index matching the tiebroken ORDER BY in
+# get_latest_sensor_data, so the LIMIT 1 is a pure index seek.
+Index("ix_sensor_ts_desc", DBSensorData.timestamp.desc(), DBSensorData.id.desc())
+
 class DBPestReport(Base):
     """Represents the pest detection reports table."""
     __tablename__ = "pest_reports"
@@ -60,6 +90,10 @@ class DBPestReport(Base):
     detection_certainty = Column(Float)
     recommendation = Column(String)
 
+# Composite descending index matching the tiebroken ORDER BY in
+# get_recent_pest_reports, so the LIMIT n avoids a full sort.
+Index("ix_pest_ts_desc", DBPestReport.timestamp.desc(), DBPestReport.id.desc())
+
 class DBManualControl(Base): 
     """Stores the manual control state requested by the user."""
     __tablename__ = "manual_control"
@@ -138,13 +172,27 @@ class WeeklyStatistics(BaseModel):
 
 def get_manual_control(db: Session) -> DBManualControl:
     """Retrieves the manual control status (used by RPi)."""
-    status = db.query(DBManualControl).filter(DBManualControl.id == 1).first()
-    if not status:
-        # Initialize default record
-        status = DBManualControl(id=1, manual_enabled=False, pump_command=False)
-        db.add(status)
-        db.commit()
-    return status
+    # The id=1 row is guaranteed to exist after startup, so Session.get can
+    # take its primary-key fast path with no existence branch per call.
+    return db.get(DBManualControl, 1)
+
+# The RPi polls /control/status/ every few seconds but the state changes
+# rarely, so recent responses are served from a short-lived in-process cache.
+CONTROL_CACHE_TTL = 2.0
+_control_cache: Dict[str, Any] = {"value": None, "ts": 0.0}
+
+def cached_manual_control(db: Session, ttl: float = CONTROL_CACHE_TTL) -> Dict[str, Any]:
+    """Returns the manual control status as a dict, cached for `ttl` seconds."""
+    if _control_cache["value"] is not None and time.monotonic() - _control_cache["ts"] < ttl:
+        return _control_cache["value"]
+    status = get_manual_control(db)
+    _control_cache["value"] = {
+        "manual_enabled": status.manual_enabled,
+        "pump_command": status.pump_command,
+        "timestamp": status.timestamp,
+    }
+    _control_cache["ts"] = time.monotonic()
+    return _control_cache["value"]
 
 def update_manual_control(db: Session, update: ManualControlUpdate) -> DBManualControl:
     """Updates the manual control status (used by Frontend)."""
@@ -153,19 +201,77 @@ def update_manual_control(db: Session, update: ManualControlUpdate) -> DBManualC
     status.pump_command = update.pump_command
     db.commit()
     db.refresh(status)
+    # Invalidate the cache so the RPi sees the new command on its next poll.
+    _control_cache["value"] = None
+    _control_cache["ts"] = 0.0
     return status
 
-def create_sensor_data(db: Session, data: SensorDataCreate) -> DBSensorData:
-    """Creates a new sensor data record."""
-    db_data = DBSensorData(**data.model_dump())
-    db.add(db_data)
-    db.commit()
-    db.refresh(db_data)
-    return db_data
-
-def get_latest_sensor_data(db: Session) -> DBSensorData | None:
-    """Gets the latest sensor data record."""
-    return db.query(DBSensorData).order_by(DBSensorData.timestamp.desc()).first()
+# Sensor rows are buffered in-process and written in one multi-row INSERT,
+# either once per flush interval or as soon as a batch fills up. This avoids
+# paying a SQLite commit (fsync) for every 5-second POST from each node.
+SENSOR_FLUSH_INTERVAL = 1.0
+SENSOR_FLUSH_BATCH = 50
+_sensor_queue: deque = deque()
+# Serializes the drain+INSERT so the batch-full flush in a request thread
+# cannot race the interval flush running on the event loop.
+_sensor_flush_lock = threading.Lock()
+
+def enqueue_sensor_data(data: SensorDataCreate) -> None:
+    """Queues a validated sensor row for the next batched INSERT."""
+    _sensor_queue.append(data.model_dump())
+    if len(_sensor_queue) >= SENSOR_FLUSH_BATCH:
+        try:
+            flush_sensor_queue()
+        except Exception as exc:
+            # The rows were re-queued; the background flush will retry them.
+            print(f"Sensor flush failed ({exc}); rows stay queued for retry.")
+
+def flush_sensor_queue() -> int:
+    """Writes all queued sensor rows in a single multi-row INSERT.
+
+    On failure (e.g. a locked database under several workers) the drained
+    rows are put back at the front of the queue before re-raising, so no
+    data is lost and the next flush retries them.
+    """
+    with _sensor_flush_lock:
+        if not _sensor_queue:
+            return 0
+        rows = []
+        while _sensor_queue:
+            rows.append(_sensor_queue.popleft())
+        db = SessionLocal()
+        try:
+            db.execute(DBSensorData.__table__.insert(), rows)
+            db.commit()
+        except Exception:
+            _sensor_queue.extendleft(reversed(rows))
+            raise
+        finally:
+            db.close()
+        return len(rows)
+
+async def _sensor_flush_loop():
+    """Background task flushing the sensor queue once per interval."""
+    while True:
+        await asyncio.sleep(SENSOR_FLUSH_INTERVAL)
+        try:
+            flush_sensor_queue()
+        except Exception as exc:
+            # Never let a transient DB error kill the task; the rows are
+            # back in the queue and the next interval retries them.
+            print(f"Sensor flush failed ({exc}); will retry next interval.")
+
+def get_latest_sensor_data(db: Session) -> SensorData | None:
+    """Gets the latest sensor data record via a Core SELECT (no ORM hydration)."""
+    row = db.execute(
+        select(DBSensorData.__table__)
+        .order_by(DBSensorData.timestamp.desc(), DBSensorData.id.desc())
+        .limit(1)
+    ).mappings().first()
+    if row is None:
+        return None
+    # The row comes from our own DB, so build the schema without re-validation.
+    return SensorData.model_construct(**row)
 
 def create_pest_report(db: Session, report: PestReportCreate) -> DBPestReport:
     """Creates a new pest report record."""
@@ -177,65 +283,75 @@ def create_pest_report(db: Session, report: PestReportCreate) -> DBPestReport:
 
 def get_recent_pest_reports(db: Session, limit: int = 10) -> List[DBPestReport]:
     """Gets the latest pest reports."""
-    return db.query(DBPestReport).order_by(DBPestReport.timestamp.desc()).limit(limit).all()
+    stmt = (
+        select(DBPestReport)
+        .order_by(DBPestReport.timestamp.desc(), DBPestReport.id.desc())
+        .limit(limit)
+    )
+    return db.execute(stmt).scalars().all()
 
 def get_weekly_statistics(db: Session) -> List[WeeklyStatistics]:
-    """Calculates aggregated weekly statistics for the last 4 weeks using pure Python logic."""
+    """Calculates aggregated weekly statistics for the last 4 weeks inside the database."""
     now = datetime.now()
     four_weeks_ago = now - timedelta(weeks=4)
-    sensor_records = db.query(DBSensorData).filter(DBSensorData.timestamp >= four_weeks_ago).all()
-    pest_reports = db.query(DBPestReport).filter(DBPestReport.timestamp >= four_weeks_ago).all()
-    if not sensor_records and not pest_reports:
-        return []
-    
-    weekly_data: Dict[str, Dict[str, Any]] = {}
 
-    def get_week_start(dt: datetime) -> datetime:
-        """Determines the start of the week (Monday=0) for the given date."""
-        day_of_week = dt.weekday()
-        start = dt - timedelta(days=day_of_week)
-        return start.replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # Process sensor data
-    for record in sensor_records:
-        week_start_dt = get_week_start(record.timestamp)
-        week_key = week_start_dt.strftime('%Y-%m-%d')
-        if week_key not in weekly_data:
-            weekly_data[week_key] = {'count': 0, 'temps': [], 'hums': [], 'soils': [], 'pest_count': 0, 'week_start_dt': week_start_dt}
-        weekly_data[week_key]['count'] += 1
-        weekly_data[week_key]['temps'].append(record.temperature)
-        weekly_data[week_key]['hums'].append(record.humidity)
-        weekly_data[week_key]['soils'].append(record.soil_moisture)
-    
-    # Process pest reports
-    for report in pest_reports:
-        week_start_dt = get_week_start(report.timestamp)
-        week_key = week_start_dt.strftime('%Y-%m-%d')
+    # SQLite expressions mapping a timestamp to the Monday / Sunday of its
+    # week ('weekday 0' advances to the next Sunday; minus 6 days is Monday).
+    # Both bounds come back as ready-made 'YYYY-MM-DD' strings, so no
+    # strptime/strftime round-trip is needed when emitting the results.
+    sensor_week_start = func.date(DBSensorData.timestamp, 'weekday 0', '-6 days')
+    sensor_week_end = func.date(DBSensorData.timestamp, 'weekday 0')
+    pest_week_start = func.date(DBPestReport.timestamp, 'weekday 0', '-6 days')
+    pest_week_end = func.date(DBPestReport.timestamp, 'weekday 0')
+
+    # Aggregate both tables in SQL so only one row per week is transferred.
+    sensor_rows = (
+        db.query(
+            sensor_week_start.label('week_start'),
+            sensor_week_end.label('week_end'),
+            func.avg(DBSensorData.temperature),
+            func.avg(DBSensorData.humidity),
+            func.avg(DBSensorData.soil_moisture),
+        )
+        .filter(DBSensorData.timestamp >= four_weeks_ago)
+        .group_by(sensor_week_start)
+        .all()
+    )
+    pest_rows = (
+        db.query(
+            pest_week_start.label('week_start'),
+            pest_week_end.label('week_end'),
+            func.count(DBPestReport.id),
+        )
+        .filter(DBPestReport.timestamp >= four_weeks_ago)
+        .group_by(pest_week_start)
+        .all()
+    )
+
+    # Merge the two small result sets (at most ~4 rows each).
+    weekly_data: Dict[str, Dict[str, Any]] = {}
+    for week_key, week_end, avg_temp, avg_hum, avg_soil in sensor_rows:
+        weekly_data[week_key] = {
+            'week_end': week_end,
+            'avg_temp': avg_temp, 'avg_hum': avg_hum, 'avg_soil': avg_soil, 'pest_count': 0
+        }
+    for week_key, week_end, pest_count in pest_rows:
         if week_key not in weekly_data:
-             weekly_data[week_key] = {'count': 0, 'temps': [], 'hums': [], 'soils': [], 'pest_count': 0, 'week_start_dt': week_start_dt}
-        weekly_data[week_key]['pest_count'] += 1
-    
-    # Calculate averages and format the result
+            weekly_data[week_key] = {
+                'week_end': week_end,
+                'avg_temp': 0.0, 'avg_hum': 0.0, 'avg_soil': 0.0, 'pest_count': 0
+            }
+        weekly_data[week_key]['pest_count'] = pest_count
+
     results: List[WeeklyStatistics] = []
-    sorted_weeks = sorted(weekly_data.keys())
-    
-    for week_key in sorted_weeks:
+    for week_key in sorted(weekly_data.keys()):
         data = weekly_data[week_key]
-        if data['count'] > 0:
-            avg_temp = sum(data['temps']) / data['count']
-            avg_hum = sum(data['hums']) / data['count']
-            avg_soil = sum(data['soils']) / data['count']
-        else:
-            avg_temp, avg_hum, avg_soil = 0.0, 0.0, 0.0
-        
-        week_start_dt = data['week_start_dt']
-        week_end_dt = week_start_dt + timedelta(days=6)
         results.append(WeeklyStatistics(
             week_start=week_key,
-            week_end=week_end_dt.strftime('%Y-%m-%d'),
-            avg_temperature=round(avg_temp, 2),
-            avg_humidity=round(avg_hum, 2),
-            avg_soil_moisture=round(avg_soil, 2),
+            week_end=data['week_end'],
+            avg_temperature=round(data['avg_temp'], 2),
+            avg_humidity=round(data['avg_hum'], 2),
+            avg_soil_moisture=round(data['avg_soil'], 2),
             total_pest_reports=data['pest_count']
         ))
     return results
@@ -251,8 +367,39 @@ app = FastAPI(
     title="Smart Farm Backend API",
     description="API for managing smart farm data and manual control.",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
+@app.on_event("startup")
+def ensure_manual_control_row():
+    """Inserts the singleton manual-control row if it does not exist yet.
+
+    Doing this once at startup (INSERT OR IGNORE, safe across the gunicorn
+    workers) lets get_manual_control skip the read-then-insert branch that
+    every status poll used to pay.
+    """
+    db = SessionLocal()
+    try:
+        stmt = (
+            sqlite_insert(DBManualControl)
+            .values(id=1, manual_enabled=False, pump_command=False)
+            .on_conflict_do_nothing(index_elements=["id"])
+        )
+        db.execute(stmt)
+        db.commit()
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def start_sensor_flush_task():
+    """Starts the background task that batches queued sensor rows."""
+    asyncio.create_task(_sensor_flush_loop())
+
+@app.on_event("shutdown")
+def drain_sensor_queue():
+    """Writes any still-queued sensor rows before the worker exits."""
+    flush_sensor_queue()
+
 # --- NEW: ROOT PATH ---
 @app.get("/", tags=["Status"], summary="Server Health Check")
 def read_root():
@@ -274,19 +421,22 @@ def get_manual_control_status(db: Session = Depends(get_db)):
     """
     **[For Raspberry Pi]** Retrieve the manual control status and requested command.
     """
-    return get_manual_control(db)
+    return cached_manual_control(db)
 
 
 # ----------------- Data Ingestion & Status Paths -----------------
 
-@app.post("/data/sensor/", response_model=SensorData, status_code=201, tags=["Data Ingestion"])
-def record_sensor_data(data: SensorDataCreate, db: Session = Depends(get_db)):
+@app.post("/data/sensor/", status_code=202, tags=["Data Ingestion"])
+def record_sensor_data(data: SensorDataCreate):
     """
     **Record Sensor Data**
-    Used by Raspberry Pi to send temperature, humidity, soil moisture, 
+    Used by Raspberry Pi to send temperature, humidity, soil moisture,
     irrigation status, and current AI decision.
+    Rows are queued and written to the database in batches, so the
+    response acknowledges receipt instead of echoing the stored row.
     """
-    return create_sensor_data(db=db, data=data)
+    enqueue_sensor_data(data)
+    return {"queued": True}
 
 @app.post("/data/pest-report/", response_model=PestReport, status_code=201, tags=["Data Ingestion"])
 def record_pest_report(report: PestReportCreate, db: Session = Depends(get_db)):
@@ -297,7 +447,7 @@ def record_pest_report(report: PestReportCreate, db: Session = Depends(get_db)):
     """
     return create_pest_report(db=db, report=report)
 
-@app.get("/status/latest/", response_model=SensorData, tags=["Status & History"])
+@app.get("/status/latest/", response_model=None, tags=["Status & History"])
 def get_current_status(db: Session = Depends(get_db)):
     """
     **Current Farm Status**
@@ -308,15 +458,19 @@ def get_current_status(db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="No sensor data found.")
     return latest_data
 
-@app.get("/reports/recent/", response_model=List[PestReport], tags=["Status & History"])
+@app.get("/reports/recent/", response_model=None, tags=["Status & History"])
 def get_latest_pest_reports(db: Session = Depends(get_db)):
     """
     **Latest Pest Reports**
     Retrieves a list of the most recently logged pest reports.
     """
-    return get_recent_pest_reports(db)
+    # Rows come from our own DB, so build the schemas without re-validation.
+    return [
+        PestReport.model_construct(**{c.name: getattr(r, c.name) for c in DBPestReport.__table__.columns})
+        for r in get_recent_pest_reports(db)
+    ]
 
-@app.get("/statistics/weekly/", response_model=List[WeeklyStatistics], tags=["Analytics"])
+@app.get("/statistics/weekly/", response_model=None, tags=["Analytics"])
 def get_weekly_stats(db: Session = Depends(get_db)):
     """
     **Weekly Statistics**
@@ -0,0 +1,36 @@
+# =======================================================================
+# Offline Conversion: sklearn irrigation model -> ONNX
+# Run this on a desktop machine (needs skl2onnx), then copy the .onnx
+# file next to the .pkl bundle on the Raspberry Pi.
+# =======================================================================
+import joblib
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+# =================== SETTINGS ===================
+MODEL_PATH = "models/irrigation_model_merged.pkl"
+OUTPUT_PATH = "models/irrigation_model_merged.onnx"
+
+bundle = joblib.load(MODEL_PATH)
+model = bundle["model"]
+features = bundle["features"]
+
+# zipmap=False makes the probability output a plain (N, 2) float array
+# instead of a list of dicts, so the Pi can index [0, 1] directly.
+onx = convert_sklearn(
+    model,
+    initial_types=[("X", FloatTensorType([None, len(features)]))],
+    options={id(model): {"zipmap": False}},
+)
+with open(OUTPUT_PATH, "wb") as f:
+    f.write(onx.SerializeToString())
+print(f"[✓] Wrote {OUTPUT_PATH}")
+
+# Optional: also emit a dynamically quantized (uint8 weights) variant.
+try:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    int8_path = OUTPUT_PATH.replace(".onnx", "_int8.onnx")
+    quantize_dynamic(OUTPUT_PATH, int8_path, weight_type=QuantType.QUInt8)
+    print(f"[✓] Wrote {int8_path}")
+except ImportError:
+    print("[!] onnxruntime.quantization not available; skipped INT8 variant.")
@@ -0,0 +1,48 @@
+# =======================================================================
+# Offline Conversion: SavedModel -> INT8 TFLite
+# Run this on a desktop machine (needs full TensorFlow), then copy the
+# resulting .tflite file next to pest_detection.py on the Raspberry Pi.
+# =======================================================================
+import glob
+import os
+import numpy as np
+import tensorflow as tf
+
+# =================== SETTINGS ===================
+MODEL_DIR = "plant_disease_tomato_tf"          # SavedModel folder
+OUTPUT_PATH = "plant_disease_tomato_int8.tflite"
+SAMPLES_DIR = "calibration_images"             # Real frames for calibration
+IMG_SIZE = (150, 150)
+NUM_SAMPLES = 100
+
+
+def representative_dataset():
+    """Yields calibration inputs so the converter can pick INT8 scales."""
+    paths = sorted(glob.glob(os.path.join(SAMPLES_DIR, "*.jpg")))[:NUM_SAMPLES]
+    if paths:
+        import cv2
+        for path in paths:
+            img = cv2.imread(path)
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            img = cv2.resize(img, IMG_SIZE).astype(np.float32) / 255.0
+            yield [np.expand_dims(img, axis=0)]
+    else:
+        print(f"[!] No calibration images in {SAMPLES_DIR}/ - using random data "
+              "(quantized accuracy may suffer; add real frames for best results).")
+        for _ in range(NUM_SAMPLES):
+            yield [np.random.rand(1, IMG_SIZE[1], IMG_SIZE[0], 3).astype(np.float32)]
+
+
+converter = tf.lite.TFLiteConverter.from_saved_model(MODEL_DIR)
+converter.optimizations = [tf.lite.Optimize.DEFAULT]
+converter.representative_dataset = representative_dataset
+converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+# uint8 I/O lets the Pi feed camera bytes directly; the /255 normalization
+# is folded into the input quantization scale.
+converter.inference_input_type = tf.uint8
+converter.inference_output_type = tf.uint8
+
+tflite_model = converter.convert()
+with open(OUTPUT_PATH, "wb") as f:
+    f.write(tflite_model)
+print(f"[✓] Wrote {OUTPUT_PATH} ({len(tflite_model) / 1024:.0f} KiB)")
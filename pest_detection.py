@@ -2,15 +2,23 @@
 # Pest Detection Code and API Report Sending
 # =======================================================================
 import os
+import queue
+import threading
 import time
 import numpy as np
 import cv2
 import requests # HTTP requests library
 from picamera2 import Picamera2
-import tensorflow as tf
+
+# Prefer the lightweight TFLite runtime on the Pi; fall back to the full
+# TensorFlow package when only that is installed (e.g. on a desktop).
+try:
+    from tflite_runtime.interpreter import Interpreter
+except ImportError:
+    from tensorflow.lite import Interpreter
 
 # =================== SETTINGS ===================
-MODEL_DIR = "plant_disease_tomato_tf"      # SavedModel folder
+MODEL_PATH = "plant_disease_tomato_int8.tflite"  # INT8 model (see convert_model_tflite.py)
 LABELS_FILE = "labels.txt"                 # Labels file
 IMG_SIZE = (150, 150)
 CONF_TH = 0.85 # Increased confidence level to reduce false alerts
@@ -55,19 +63,35 @@ with open(LABELS_FILE, "r", encoding="utf-8") as f:
 
 print(f"[✓] Loaded {len(LABELS)} labels.")
 
-print(f"\n[ ] Loading SavedModel from: {MODEL_DIR} ...")
-saved_model = tf.saved_model.load(MODEL_DIR)
-infer = saved_model.signatures["serving_default"]
-print("[✓] SavedModel loaded successfully!\n")
+print(f"\n[ ] Loading TFLite model from: {MODEL_PATH} ...")
+interpreter = Interpreter(model_path=MODEL_PATH, num_threads=4)
+interpreter.allocate_tensors()
+_input_detail = interpreter.get_input_details()[0]
+_output_detail = interpreter.get_output_details()[0]
+print("[✓] TFLite model loaded successfully!\n")
+
+# Preallocated host buffers reused across frames (no per-frame allocation).
+_resized_u8 = np.empty((IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.uint8)
+_input_buf = np.empty((1, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=_input_detail["dtype"])
 
 def predict_image(img):
-    # Prediction function
-    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    img = cv2.resize(img, IMG_SIZE).astype(np.float32) / 255.0
-    img = np.expand_dims(img, axis=0)
-    inp = tf.convert_to_tensor(img)
-    outputs = infer(inp)
-    probs = list(outputs.values())[0].numpy()[0]
+    # Prediction function. Resize first, while the frame is still uint8 BGR,
+    # so the colour conversion and normalization only touch 150x150 pixels
+    # instead of the full camera frame (one pass over the frame, not three).
+    cv2.resize(img, IMG_SIZE, dst=_resized_u8, interpolation=cv2.INTER_AREA)
+    cv2.cvtColor(_resized_u8, cv2.COLOR_BGR2RGB, dst=_resized_u8)
+    if _input_detail["dtype"] == np.uint8:
+        # Fully quantized model: feed camera bytes directly, the /255
+        # normalization is folded into the input quantization scale.
+        _input_buf[0] = _resized_u8
+    else:
+        np.multiply(_resized_u8, np.float32(1.0 / 255.0), out=_input_buf[0], dtype=np.float32)
+    interpreter.set_tensor(_input_detail["index"], _input_buf)
+    interpreter.invoke()
+    probs = interpreter.get_tensor(_output_detail["index"])[0]
+    if probs.dtype != np.float32:
+        scale, zero_point = _output_detail["quantization"]
+        probs = (probs.astype(np.float32) - zero_point) * scale
     idx = int(np.argmax(probs))
     conf = float(probs[idx])
     return LABELS[idx], conf
@@ -115,9 +139,33 @@ else:
     picam2.start()
     time.sleep(2)
 
+    # Capture runs in a background thread feeding a one-slot queue; a stale
+    # frame is dropped as soon as a newer one arrives, so each inference pass
+    # sees the current scene instead of a buffer from 10 seconds ago.
+    _frame_q = queue.Queue(maxsize=1)
+    _capture_stop = threading.Event()
+
+    def _capture_loop():
+        while not _capture_stop.is_set():
+            frame = picam2.capture_array("main")
+            try:
+                _frame_q.put_nowait(frame)
+            except queue.Full:
+                try:
+                    _frame_q.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    _frame_q.put_nowait(frame)
+                except queue.Full:
+                    pass
+
+    _capture_thread = threading.Thread(target=_capture_loop, daemon=True)
+    _capture_thread.start()
+
     try:
         while True:
-            frame = picam2.capture_array()
+            frame = _frame_q.get()  # Newest available frame
             pred, conf = predict_image(frame)
 
             if conf >= CONF_TH:
@@ -134,4 +182,5 @@ else:
     except KeyboardInterrupt:
         print("\nStopped by user.")
     finally:
+        _capture_stop.set()
         picam2.stop()
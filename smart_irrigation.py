@@ -4,27 +4,27 @@
 
 # ----------- Import Libraries -----------
 import warnings
-warnings.filterwarnings("ignore") 
+warnings.filterwarnings("ignore")
 
-import time, math, statistics, csv, os
-from collections import deque
+import asyncio
+import time, math, csv, os
 from datetime import datetime, timezone
 import numpy as np
 import joblib
 import RPi.GPIO as GPIO
 import spidev, board, adafruit_dht
-import requests # Library for sending and receiving API data
+import httpx # Async HTTP client; HTTP/2 multiplexes both endpoints over one TLS session
 
 # ----------- User Settings -----------
 MODEL_PATH = "models/irrigation_model_merged.pkl"
 RELAY_PIN = 17
-ACTIVE_HIGH = True 
-DRY_RUN = False 
+ACTIVE_HIGH = True
+DRY_RUN = False
 SOIL_CH = 0
 WET = 233
 DRY = 619
 THRESH_OVERRIDE = None
-EMERGENCY_ON_PCT = 20.0 
+EMERGENCY_ON_PCT = 20.0
 BURST_ON_SEC = 4
 REST_SEC = 5
 MIN_ON_SEC = 6
@@ -35,7 +35,7 @@ HOURLY_BUCKET = 3600
 
 # ----------- Server Settings (MUST BE UPDATED) -----------
 # Ensure this is the full HTTPS public URL from Render
-API_URL = "https://backend-qkbr.onrender.com" 
+API_URL = "https://backend-qkbr.onrender.com"
 SENSOR_DATA_ENDPOINT = f"{API_URL}/data/sensor/"
 CONTROL_STATUS_ENDPOINT = f"{API_URL}/control/status/"
 REPORT_INTERVAL = 5 # Send data every 5 seconds
@@ -57,6 +57,34 @@ except FileNotFoundError:
 if THRESH_OVERRIDE is not None:
     THRESH = float(THRESH_OVERRIDE)
 
+# Feature name -> column index resolved once at startup; the per-tick code
+# writes straight into a reusable input row instead of building a dict and a
+# fresh array every 1.5 s. Features the loop never sets stay 0.0, matching
+# the old row.get(name, 0.0) fallback.
+_feat_idx = {name: i for i, name in enumerate(FEATURES)} if MODEL else {}
+_X = np.zeros((1, len(FEATURES)), dtype=np.float64) if MODEL else None
+_X32 = np.zeros((1, len(FEATURES)), dtype=np.float32) if MODEL else None
+
+# Prefer an ONNX Runtime session when the converted model is present (see
+# convert_model_onnx.py): its C++ executor walks the ensemble far faster
+# than sklearn's Python-level predict_proba on a Pi CPU. The .pkl bundle is
+# still loaded above for FEATURES and the decision threshold.
+ONNX_MODEL_PATH = MODEL_PATH.replace(".pkl", ".onnx")
+ORT_SESSION = None
+if MODEL is not None and os.path.exists(ONNX_MODEL_PATH):
+    try:
+        import onnxruntime as ort
+        ORT_SESSION = ort.InferenceSession(ONNX_MODEL_PATH, providers=["CPUExecutionProvider"])
+        print(f"Using ONNX Runtime for irrigation inference: {ONNX_MODEL_PATH}")
+    except ImportError:
+        print("onnxruntime not installed; falling back to sklearn predict_proba.")
+
+def set_feature(name, value):
+    """Writes one model input into the shared X row (unknown names are ignored)."""
+    i = _feat_idx.get(name)
+    if i is not None:
+        _X[0, i] = value
+
 
 # ----------- Hardware Setup (GPIO, SPI, DHT22) -----------
 GPIO.setmode(GPIO.BCM)
@@ -96,22 +124,48 @@ def read_dht_safe():
         pass
     return None, None
 
-def vpd_kpa(temp_c, rh):
-    """Calculate Vapor Pressure Deficit (VPD)"""
-    if (temp_c is None) or (rh is None): return None
-    es = 0.6108 * math.exp((17.27*temp_c)/(temp_c+237.3))
-    ea = es * (rh/100.0)
-    return es - ea
+# Vapor Pressure Deficit (VPD) is computed over a rolling window of recent
+# DHT samples in a single ufunc pass; the windowed mean gives the AI model a
+# smoother signal than the noisy instantaneous value.
+VPD_WINDOW = 12
+_t_arr = np.zeros(VPD_WINDOW, dtype=np.float32)
+_h_arr = np.zeros(VPD_WINDOW, dtype=np.float32)
+_vpd_i = 0
+_vpd_n = 0
+
+def update_vpd_window(temp_c, rh):
+    """Push a temp/humidity sample and recompute VPD (kPa) over the window.
+    Returns (current_vpd, smoothed_vpd); (None, None) until the first valid
+    DHT sample arrives. Invalid samples leave the window unchanged."""
+    global _vpd_i, _vpd_n
+    if (temp_c is not None) and (rh is not None):
+        _t_arr[_vpd_i] = temp_c
+        _h_arr[_vpd_i] = rh
+        _vpd_i = (_vpd_i + 1) % VPD_WINDOW
+        _vpd_n = min(_vpd_n + 1, VPD_WINDOW)
+    if _vpd_n == 0:
+        return None, None
+    t = _t_arr[:_vpd_n]
+    h = _h_arr[:_vpd_n]
+    es = 0.6108 * np.exp(17.27 * t / (t + 237.3))
+    vpd_arr = es * (1.0 - h / 100.0)
+    current = float(vpd_arr[(_vpd_i - 1) % _vpd_n])
+    return current, float(vpd_arr.mean())
 
 
 # ----------- API Functions -----------
 
-def send_sensor_data(temp, hum, soil_pct, irrigation_status, ai_reason):
-    """Send sensor data and decision to the server."""
+# Last manual-control state fetched from the server. It is refreshed by a
+# background task so the control loop reads a dict instead of waiting up to
+# API_TIMEOUT seconds on a slow network.
+manual_state = {"enabled": False, "pump": False}
+
+async def send_sensor_data(client, temp, hum, soil_pct, irrigation_status, ai_reason):
+    """Send sensor data and decision to the server (runs as a background task)."""
     temp_safe = temp if temp is not None else 25.0
     hum_safe = hum if hum is not None else 50.0
     ai_decision_text = f"Irrigation required (Reason: {ai_reason})" if irrigation_status else "Irrigation not required"
-    
+
     payload = {
         "temperature": temp_safe,
         "humidity": hum_safe,
@@ -119,188 +173,251 @@ def send_sensor_data(temp, hum, soil_pct, irrigation_status, ai_reason):
         "irrigation_status": irrigation_status,
         "ai_decision": ai_decision_text
     }
-    
+
     try:
         # Using the increased timeout for better network resilience
-        requests.post(SENSOR_DATA_ENDPOINT, json=payload, timeout=API_TIMEOUT) 
-    except requests.exceptions.RequestException as e:
+        await client.post(SENSOR_DATA_ENDPOINT, json=payload, timeout=API_TIMEOUT)
+    except httpx.HTTPError:
         print(f"[{datetime.now().strftime('%H:%M:%S')}] ✗ Network Error sending data. Timeout: {API_TIMEOUT}s")
 
-def get_manual_control_status():
-    """Fetch manual control status from the server."""
+async def refresh_manual_control(client):
+    """Fetch manual control status from the server into manual_state."""
     try:
-        # Using the increased timeout
-        response = requests.get(CONTROL_STATUS_ENDPOINT, timeout=API_TIMEOUT)
+        response = await client.get(CONTROL_STATUS_ENDPOINT, timeout=API_TIMEOUT)
         if response.status_code == 200:
             data = response.json()
-            return data.get('manual_enabled', False), data.get('pump_command', False)
-        # Handle 404/400 errors safely
-        return False, False 
-    except requests.exceptions.RequestException:
-        # Revert to safe automated mode on connection failure
-        return False, False 
+            manual_state["enabled"] = data.get('manual_enabled', False)
+            manual_state["pump"] = data.get('pump_command', False)
+            return
+    except httpx.HTTPError:
+        pass
+    # Revert to safe automated mode on HTTP errors or connection failure
+    manual_state["enabled"] = False
+    manual_state["pump"] = False
 
 
 # ----------- Filters and Buffers -----------
 MEDIAN_N = 9
 AVG_WINDOW = 12
-buf = deque(maxlen=AVG_WINDOW)
+SOIL_MA_WINDOW = 30
+
+class RollingSum:
+    """Fixed-size rolling window with an incrementally maintained sum, so
+    pushing a sample and reading the mean are both O(1) regardless of the
+    window length (no per-tick iteration over the buffer)."""
+    __slots__ = ("arr", "i", "total", "n", "cap")
+
+    def __init__(self, cap):
+        self.arr = [0] * cap
+        self.i = 0
+        self.total = 0
+        self.n = 0
+        self.cap = cap
+
+    def push(self, value):
+        if self.n < self.cap:
+            self.n += 1
+        else:
+            self.total -= self.arr[self.i]
+        self.arr[self.i] = value
+        self.total += value
+        self.i = (self.i + 1) % self.cap
+
+    def mean(self):
+        return self.total / self.n
+
+# Scratch array for the SPI median samples plus the two smoothing windows.
+_median_samples = np.empty(MEDIAN_N, dtype=np.int16)
+_buf = RollingSum(AVG_WINDOW)
+_last30 = RollingSum(SOIL_MA_WINDOW)
 last_soil = None
-last30 = deque(maxlen=30)
-# State to help monitor manual mode activity
-last_manual_enabled = False 
-
-# ----------- Status Variables -----------
-pump_on = False
-last_change = time.time()
-on_start = 0.0
-rest_until = 0.0
-hour_window_start = time.time()
-run_sec_this_hour = 0
-last_report_time = time.time()
-last_control_check = time.time()
-
-
-# ----------- Logging Setup -----------
-logfile = "ai_irrigation_log.csv"
-print(f"Smart AI Irrigation Started | THRESH={THRESH:.3f} | ACTIVE_HIGH={ACTIVE_HIGH} | DRY_RUN={DRY_RUN} | API_TIMEOUT={API_TIMEOUT}s\n")
-with open(logfile, "w", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow(["timestamp","temp_C","hum_%","vpd","adc_raw","soil_%","soil_ma","delta_soil","proba","decision","reason","pump_on"])
 
-    try:
-        while True:
-            now = time.time()
-            global last_manual_enabled
-
-            # Update hourly monitoring window
-            if now - hour_window_start >= HOURLY_BUCKET:
-                hour_window_start = now
-                run_sec_this_hour = 0
-
-            # ---------------- 1. Readings and Processing ----------------
-            vals = [read_adc(SOIL_CH) for _ in range(MEDIAN_N)]
-            med = int(statistics.median(vals))
-            buf.append(med)
-            adc_smooth = sum(buf)//len(buf)
-            soil = adc_to_pct(adc_smooth)
-
-            temp, hum = read_dht_safe()
-            vpd = vpd_kpa(temp, hum)
-            hour = int(datetime.now(timezone.utc).strftime("%H"))
-            sin_h = math.sin(2*math.pi*hour/24.0)
-            cos_h = math.cos(2*math.pi*hour/24.0)
-
-            last30.append(soil)
-            soil_ma = sum(last30)/len(last30)
-            delta = 0.0 if last_soil is None else soil - last_soil
-            last_soil = soil
-            
-            # ---------------- 2. Manual Override Check ----------------
-            manual_enabled = False
-            pump_command_manual = False
-            
-            # Check manual control status
-            if now - last_control_check >= CONTROL_CHECK_INTERVAL:
-                manual_enabled, pump_command_manual = get_manual_control_status()
-                last_control_check = now
-            
-            # Log any change in manual mode state
-            if manual_enabled != last_manual_enabled:
-                print(f"\n*** SYSTEM STATE CHANGE: Manual Mode {'ENABLED' if manual_enabled else 'DISABLED'} ***\n")
-                last_manual_enabled = manual_enabled
-            
-            # ---------------- 3. AI Decision (Only if not Manual) ----------------
-            final_decision = False
-            reason = "NO"
-
-            if MODEL:
-                # Prepare AI inputs
-                row = {
-                    "temperature_C": temp if temp is not None else 25.0,
-                    "humidity_air_%": hum if hum is not None else 50.0,
-                    "soil_moisture_%": soil,
-                    "hour": hour,
-                    "sin_hour": sin_h,
-                    "cos_hour": cos_h,
-                    "soil_moisture_ma": soil_ma,
-                    "delta_soil": delta,
-                    "vpd_kPa": vpd if vpd is not None else 1.0,
-                }
-                X = np.array([[row.get(f, 0.0) for f in FEATURES]], dtype=float)
-                proba = float(MODEL.predict_proba(X)[0,1])
-            else:
-                proba = 0.0 # If model loading failed, assume low probability
-
-            decision_ai = (proba >= THRESH)
-            decision_emg = (soil <= EMERGENCY_ON_PCT)
-            
-            # ---------------- 4. Final Decision Determination ----------------
-            if manual_enabled:
-                # OVERRIDE: Execute user's command
-                final_decision = pump_command_manual
-                reason = "MANUAL"
-            else:
-                # AUTOMATIC: Execute AI or Emergency rule
-                final_decision = decision_ai or decision_emg
-                reason = "AI" if decision_ai else ("EMERGENCY" if decision_emg else "NO")
-
-            in_rest = now < rest_until
-            
-            # ---------------- 5. Pump Control Execution ----------------
-            
-            # Turn ON irrigation
-            if (not pump_on) and final_decision and (not in_rest) and (now-last_change)>=MIN_OFF_SEC:
-                if (run_sec_this_hour/60.0) < MAX_MIN_PER_HOUR:
-                    relay_set(True)
-                    pump_on=True
-                    on_start=now
-                    last_change=now
+def read_sensor_tick():
+    """Blocking sensor reads + filtering; dispatched to the executor thread
+    so HTTP tasks keep making progress while SPI/DHT I/O is in flight."""
+    global last_soil
+    for i in range(MEDIAN_N):
+        _median_samples[i] = read_adc(SOIL_CH)
+    med = int(np.median(_median_samples))
+    _buf.push(med)
+    adc_smooth = int(_buf.mean())
+    soil = adc_to_pct(adc_smooth)
 
-            # Turn OFF after duration or due to manual OFF command
-            is_safety_cut_off = pump_on and (now - on_start) >= MAX_ON_SEC
-            is_pulse_end = pump_on and (now - on_start) >= BURST_ON_SEC
-            is_manual_off = manual_enabled and pump_on and not pump_command_manual
-
-            if (is_safety_cut_off or is_pulse_end or is_manual_off) and (now - last_change) >= MIN_ON_SEC:
-                relay_set(False)
-                pump_on=False
-                last_change=now
-                rest_until = now + REST_SEC
-                if is_safety_cut_off:
-                    print("Safety cutoff — forced OFF")
-                elif is_manual_off:
-                    print("Manual Command OFF received.")
-                else:
-                    print("Pump OFF (pulse ended / soak period)")
+    temp, hum = read_dht_safe()
 
+    _last30.push(soil)
+    soil_ma = _last30.mean()
+    delta = 0.0 if last_soil is None else soil - last_soil
+    last_soil = soil
+    return med, soil, soil_ma, delta, temp, hum
 
-            if pump_on:
-                run_sec_this_hour = min(HOURLY_BUCKET, run_sec_this_hour + 1)
 
-            # ---------------- 6. API Data Sending ----------------
-            if now - last_report_time >= REPORT_INTERVAL:
-                send_sensor_data(temp, hum, soil, pump_on, reason)
-                last_report_time = now
+# ----------- Main Control Loop -----------
+logfile = "ai_irrigation_log.csv"
+LOG_FLUSH_EVERY = 20 # Flush the CSV every N ticks (~30 s) instead of every row
+
+async def main():
+    # ----------- Status Variables -----------
+    pump_on = False
+    last_change = time.time()
+    on_start = 0.0
+    rest_until = 0.0
+    hour_window_start = time.time()
+    run_sec_this_hour = 0
+    last_report_time = time.time()
+    last_control_check = time.time()
+    # State to help monitor manual mode activity
+    last_manual_enabled = False
+    # CSV flush batching state
+    tick_count = 0
+    prev_pump_on = False
+
+    loop = asyncio.get_running_loop()
+    # One HTTP/2 connection multiplexes the sensor POSTs and control GETs
+    # (Render's edge speaks HTTP/2), so the two cadences never queue behind
+    # each other the way they would on serialized HTTP/1.1 connections.
+    limits = httpx.Limits(max_connections=2, max_keepalive_connections=2)
+    async with httpx.AsyncClient(http2=True, limits=limits) as client:
+        with open(logfile, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["timestamp","temp_C","hum_%","vpd","adc_raw","soil_%","soil_ma","delta_soil","proba","decision","reason","pump_on"])
+
+            while True:
+                now = time.time()
+
+                # Update hourly monitoring window
+                if now - hour_window_start >= HOURLY_BUCKET:
+                    hour_window_start = now
+                    run_sec_this_hour = 0
+
+                # ---------------- 1. Readings and Processing ----------------
+                med, soil, soil_ma, delta, temp, hum = await loop.run_in_executor(None, read_sensor_tick)
+                vpd, vpd_ma = update_vpd_window(temp, hum)
+                hour = int(datetime.now(timezone.utc).strftime("%H"))
+                sin_h = math.sin(2*math.pi*hour/24.0)
+                cos_h = math.cos(2*math.pi*hour/24.0)
+
+                # ---------------- 2. Manual Override Check ----------------
+                # Kick off a background refresh; the loop itself never waits
+                # on the network and keeps using the last known state.
+                if now - last_control_check >= CONTROL_CHECK_INTERVAL:
+                    asyncio.create_task(refresh_manual_control(client))
+                    last_control_check = now
+                manual_enabled = manual_state["enabled"]
+                pump_command_manual = manual_state["pump"]
+
+                # Log any change in manual mode state
+                if manual_enabled != last_manual_enabled:
+                    print(f"\n*** SYSTEM STATE CHANGE: Manual Mode {'ENABLED' if manual_enabled else 'DISABLED'} ***\n")
+                    last_manual_enabled = manual_enabled
+
+                # ---------------- 3. AI Decision (Only if not Manual) ----------------
+                final_decision = False
+                reason = "NO"
+
+                if MODEL:
+                    # Prepare AI inputs (written into the preallocated row)
+                    set_feature("temperature_C", temp if temp is not None else 25.0)
+                    set_feature("humidity_air_%", hum if hum is not None else 50.0)
+                    set_feature("soil_moisture_%", soil)
+                    set_feature("hour", hour)
+                    set_feature("sin_hour", sin_h)
+                    set_feature("cos_hour", cos_h)
+                    set_feature("soil_moisture_ma", soil_ma)
+                    set_feature("delta_soil", delta)
+                    # The model gets the windowed VPD, which is less noisy
+                    # than the single-sample value logged below.
+                    set_feature("vpd_kPa", vpd_ma if vpd_ma is not None else 1.0)
+                    if ORT_SESSION is not None:
+                        # Converted with zipmap=False: outputs are [label, probabilities]
+                        np.copyto(_X32, _X)
+                        proba = float(ORT_SESSION.run(None, {"X": _X32})[1][0, 1])
+                    else:
+                        proba = float(MODEL.predict_proba(_X)[0,1])
+                else:
+                    proba = 0.0 # If model loading failed, assume low probability
 
-            # ---------------- 7. Logging and Printing ----------------
-            writer.writerow([
-                datetime.now(timezone.utc).isoformat(timespec="seconds"),
-                temp, hum, round(vpd,3) if vpd is not None else "",
-                med, round(soil,1), round(soil_ma,1), round(delta,2),
-                round(proba,3), int(final_decision), reason, int(pump_on)
-            ])
-            f.flush()
+                decision_ai = (proba >= THRESH)
+                decision_emg = (soil <= EMERGENCY_ON_PCT)
 
-            print(f"{datetime.now().strftime('%H:%M:%S')} | T:{temp if temp else 'NA'}°C H:{hum if hum else 'NA'}% "
-                  f"Soil:{soil:.1f}% p={proba:.3f} | Decision:{'ON' if pump_on else 'OFF'} ({reason}) | Manual:{'YES' if manual_enabled else 'NO'}")
+                # ---------------- 4. Final Decision Determination ----------------
+                if manual_enabled:
+                    # OVERRIDE: Execute user's command
+                    final_decision = pump_command_manual
+                    reason = "MANUAL"
+                else:
+                    # AUTOMATIC: Execute AI or Emergency rule
+                    final_decision = decision_ai or decision_emg
+                    reason = "AI" if decision_ai else ("EMERGENCY" if decision_emg else "NO")
+
+                in_rest = now < rest_until
+
+                # ---------------- 5. Pump Control Execution ----------------
+
+                # Turn ON irrigation
+                if (not pump_on) and final_decision and (not in_rest) and (now-last_change)>=MIN_OFF_SEC:
+                    if (run_sec_this_hour/60.0) < MAX_MIN_PER_HOUR:
+                        relay_set(True)
+                        pump_on=True
+                        on_start=now
+                        last_change=now
+
+                # Turn OFF after duration or due to manual OFF command
+                is_safety_cut_off = pump_on and (now - on_start) >= MAX_ON_SEC
+                is_pulse_end = pump_on and (now - on_start) >= BURST_ON_SEC
+                is_manual_off = manual_enabled and pump_on and not pump_command_manual
+
+                if (is_safety_cut_off or is_pulse_end or is_manual_off) and (now - last_change) >= MIN_ON_SEC:
+                    relay_set(False)
+                    pump_on=False
+                    last_change=now
+                    rest_until = now + REST_SEC
+                    if is_safety_cut_off:
+                        print("Safety cutoff — forced OFF")
+                    elif is_manual_off:
+                        print("Manual Command OFF received.")
+                    else:
+                        print("Pump OFF (pulse ended / soak period)")
+
+
+                if pump_on:
+                    run_sec_this_hour = min(HOURLY_BUCKET, run_sec_this_hour + 1)
+
+                # ---------------- 6. API Data Sending ----------------
+                # Fire-and-forget: the report goes out as a task while the
+                # control loop continues at its normal cadence.
+                if now - last_report_time >= REPORT_INTERVAL:
+                    asyncio.create_task(send_sensor_data(client, temp, hum, soil, pump_on, reason))
+                    last_report_time = now
+
+                # ---------------- 7. Logging and Printing ----------------
+                writer.writerow([
+                    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    temp, hum, round(vpd,3) if vpd is not None else "",
+                    med, round(soil,1), round(soil_ma,1), round(delta,2),
+                    round(proba,3), int(final_decision), reason, int(pump_on)
+                ])
+                tick_count += 1
+                # Flushing every row forced an SD-card write each 1.5 s tick;
+                # flush in batches, but immediately on a pump state change so
+                # those events are never lost to a power cut.
+                if pump_on != prev_pump_on or tick_count % LOG_FLUSH_EVERY == 0:
+                    f.flush()
+                prev_pump_on = pump_on
+
+                print(f"{datetime.now().strftime('%H:%M:%S')} | T:{temp if temp else 'NA'}°C H:{hum if hum else 'NA'}% "
+                      f"Soil:{soil:.1f}% p={proba:.3f} | Decision:{'ON' if pump_on else 'OFF'} ({reason}) | Manual:{'YES' if manual_enabled else 'NO'}")
+
+                await asyncio.sleep(1.5)
 
-            time.sleep(1.5)
 
-    except KeyboardInterrupt:
-        pass
-    finally:
-        relay_set(False)
-        GPIO.cleanup()
-        spi.close()
-        print("\nSystem stopped safely by the user.\n")
+print(f"Smart AI Irrigation Started | THRESH={THRESH:.3f} | ACTIVE_HIGH={ACTIVE_HIGH} | DRY_RUN={DRY_RUN} | API_TIMEOUT={API_TIMEOUT}s\n")
+try:
+    asyncio.run(main())
+except KeyboardInterrupt:
+    pass
+finally:
+    relay_set(False)
+    GPIO.cleanup()
+    spi.close()
+    print("\nSystem stopped safely by the user.\n")